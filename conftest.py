@@ -0,0 +1,51 @@
+"""PyTest configuration for the repository root."""
+import pathlib
+import warnings
+
+import pytest
+
+# Prevents pytest from walking build artefacts and generated voice packs when given
+# an explicit path outside of 'testpaths'.
+collect_ignore = ["dist", "build", "htmlcov", "resources", "voicepacks", "docs"]
+collect_ignore_glob = ["**/build/**", "**/dist/**", "**/htmlcov/**"]
+
+
+def pytest_addoption(parser):
+    """Adds command line options for skipping expensive tests."""
+    parser.addoption(
+        "--skip-network",
+        action="store_true",
+        default=False,
+        help="Skip tests which make requests to remote text-to-speech services.",
+    )
+    parser.addoption(
+        "--skip-slow",
+        action="store_true",
+        default=False,
+        help="Skip tests which take a long time to run.",
+    )
+
+
+def pytest_collection_modifyitems(config, items):
+    """Skips tests with the `network` or `slow` markers when requested."""
+    skipped = [
+        name for name in ("network", "slow") if config.getoption(f"--skip-{name}")
+    ]
+    for item in items:
+        for name in skipped:
+            if name in item.keywords:
+                item.add_marker(pytest.mark.skip(reason=f"--skip-{name} was given"))
+
+
+@pytest.fixture(name="stray_files", scope="session", autouse=True)
+def fixture_stray_files():
+    """Warns about audio or temporary files left in the working directory by tests.
+
+    Tests should write to `tmp_path` rather than the working directory, which is
+    shared between pytest-xdist workers.
+    """
+    before = set(pathlib.Path(".").glob("*.wav")) | set(pathlib.Path(".").glob("*.tmp"))
+    yield
+    after = set(pathlib.Path(".").glob("*.wav")) | set(pathlib.Path(".").glob("*.tmp"))
+    for leftover in sorted(after - before):
+        warnings.warn(f"Test run left behind '{leftover}'", stacklevel=2)
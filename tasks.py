@@ -1,7 +1,15 @@
 """Invoke tasks."""
-# from txsoundgen.invoke import ns
+import os
+import pathlib
+import shutil
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
 from invoke import task
 
+PTY = sys.stdout.isatty()
+"""Only allocate a pseudo-terminal when running interactively."""
+
 
 @task(
     help={
@@ -19,8 +27,7 @@ def fmt(command, check=False):
 @task
 def lint(command):
     """Run lint tests."""
-    command.run("pylint txsoundgen")
-    # pylint.run_pylint(argv=["txsoundgen", "tests", "tasks.py"])
+    command.run("ruff check .")
 
 
 @task
@@ -29,27 +36,62 @@ def coverage(command):
     command.run("coverage report -m")
 
 
-@task
-def unit(command):
+@task(
+    help={
+        "all": "Include slow tests and tests which call remote services.",
+        "jobs": "Number of pytest-xdist workers to use. Defaults to 'auto'.",
+        "benchmark": "Report the slowest test durations.",
+        "lf": "Only re-run the tests which failed during the last run.",
+        "ff": "Run the tests which failed during the last run first.",
+    },
+)
+def unit(command, all=False, jobs="auto", benchmark=False, lf=False, ff=True):
     """Run unit tests."""
-    command.run(
-        "pytest --cov=txsoundgen --cov-branch --cov-report=term --cov-report=html",
-        pty=True,
-    )
+    cmd = f"pytest tests -n {jobs} --dist loadfile"
+    if not all:
+        cmd += " -m 'not slow and not network'"
+    if ff:
+        cmd += " --failed-first"
+    if lf:
+        cmd += " --last-failed"
+    cmd += " --cov=txsoundgen --cov-branch --cov-report=term --cov-report=html"
+    if benchmark:
+        cmd += " --durations=10"
+    command.run(cmd, pty=PTY)
 
 
 @task
 def test(command):
     """Run full test suite."""
-    fmt(command)
-    lint(command)
+    # Formatting is only checked here so that files are not rewritten underneath the
+    # linter while both run concurrently.
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        checks = [
+            executor.submit(fmt, command, check=True),
+            executor.submit(lint, command),
+        ]
+        for check in checks:
+            check.result()
     unit(command)
 
 
+POETRY_ENV = {
+    "POETRY_CACHE_DIR": os.environ.get(
+        "POETRY_CACHE_DIR", os.path.expanduser("~/.cache/pypoetry")
+    )
+}
+
+
 @task
 def dependencies(command):
     """Install dependencies."""
-    command.run("poetry install")
+    command.run("poetry install --sync --no-root", env=POETRY_ENV)
+
+
+@task
+def deps_lockonly(command):
+    """Install runtime dependencies only, without the package itself."""
+    command.run("poetry install --only main --no-root", env=POETRY_ENV)
 
 
 @task
@@ -58,13 +100,23 @@ def update(command):
     command.run("poetry update")
 
 
-@task
-def clean(command):
+@task(
+    help={"all": "Also remove the pytest cache used to track failed tests."},
+)
+def clean(command, all=False):
     """Clean development environment, removing temporary files."""
-    command.run("rm -rf dist/ build/ **/__pycache__ .pytest_cache/")
-    # These will probably go away
-    command.run("rm -rf htmlcov/")
-    command.run("rm -f voicepacks/**.wav")
+    paths = ["dist", "build", "htmlcov"]
+    if all:
+        paths.append(".pytest_cache")
+    for path in paths:
+        shutil.rmtree(path, ignore_errors=True)
+    # Only project sources, so installed packages in .venv keep their bytecode.
+    for source in ("txsoundgen", "tests"):
+        for cache in pathlib.Path(source).rglob("__pycache__"):
+            shutil.rmtree(cache, ignore_errors=True)
+    # This will probably go away
+    for sound in pathlib.Path("voicepacks").rglob("*.wav"):
+        sound.unlink()
 
 
 @task
@@ -102,8 +154,7 @@ def publish(command):
 def deploy(command):
     """Full clean build and publish"""
     clean(command)
-    build(command)
-    publish(command)
+    command.run("poetry publish --build")
 
 
 @task(default=True)
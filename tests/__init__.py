@@ -1,15 +1,68 @@
 """Tests used by PyTest to ensure the module is working as expected."""
+import io
 import os
 import sys
-import boto3
-import pytest
 
+import pytest
 
 # Modifies path to allow importing of module
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 
-@pytest.fixture(name="client")
+@pytest.fixture(name="client", scope="session")
 def fixture_client():
     """Boto3 Polly client used for AWS calls."""
+    import boto3
+
     return boto3.client("polly")
+
+
+@pytest.fixture(name="mime", scope="session")
+def fixture_mime():
+    """libmagic instance used to detect the MIME type of generated files."""
+    import magic
+
+    return magic.Magic(mime=True)
+
+
+@pytest.fixture(name="cache")
+def fixture_cache(tmp_path):
+    """Cache database initialised in a temporary directory."""
+    import txsoundgen.model
+
+    yield txsoundgen.model.init_db(str(tmp_path / "cache" / "cache.db"))
+    txsoundgen.model.db.close()
+    txsoundgen.model.db.init(None)
+
+
+class PollyStub:
+    """Polly client with stubbed responses, so tests don't call AWS."""
+
+    def __init__(self):
+        """Initialises a `PollyStub` object."""
+        import boto3
+        from botocore.stub import Stubber
+
+        self.client = boto3.client("polly", region_name="eu-west-1")
+        self.stubber = Stubber(self.client)
+
+    def add_audio(self, data: bytes, expected_params: dict = None):
+        """Queues a response with an audio stream containing the given data."""
+        from botocore.response import StreamingBody
+
+        body = StreamingBody(io.BytesIO(data), len(data))
+        self.stubber.add_response(
+            "synthesize_speech", {"AudioStream": body}, expected_params
+        )
+
+    def add_error(self, code: str):
+        """Queues a client error response with the given error code."""
+        self.stubber.add_client_error("synthesize_speech", code)
+
+
+@pytest.fixture(name="polly")
+def fixture_polly():
+    """Polly client with stubbed responses, see `PollyStub`."""
+    stub = PollyStub()
+    with stub.stubber:
+        yield stub
@@ -1,29 +1,46 @@
 """Tests relating to txsoundgen.audio."""
-import os
-import magic
+import time
+import wave
+
 import pytest
-from botocore.exceptions import BotoCoreError, ClientError
+
 import txsoundgen.audio
-from tests import fixture_client  # pylint: disable=W0611
+from tests import fixture_client, fixture_mime, fixture_polly  # noqa: F401
+
+_REQUEST = {
+    "Engine": "standard",
+    "LanguageCode": "en-GB",
+    "SampleRate": "16000",
+    "VoiceId": "Amy",
+    "TextType": "ssml",
+    "OutputFormat": "pcm",
+}
 
 
-def test_wave_write_valid_data():
+def test_wave_write_valid_data(tmp_path, mime):
     """Given valid byte data, it is written to disk as a WAVE-encoded file."""
-    file = "test_wave_write.tmp"
+    file = str(tmp_path / "test_wave_write.tmp")
     txsoundgen.audio.wave_write(file, b"00")
-    mime = magic.Magic(mime=True)
     assert mime.from_file(file) == "audio/x-wav"
-    os.remove(file)
 
 
-def test_wave_write_invalid_data():
+def test_wave_write_chunked_data(tmp_path, mime):
+    """Given an iterable of byte chunks, they are written to disk as a single WAVE file."""
+    file = str(tmp_path / "test_wave_write_chunked_data.tmp")
+    txsoundgen.audio.wave_write(file, iter([b"00", b"11", b"22"]))
+    assert mime.from_file(file) == "audio/x-wav"
+    with wave.open(file, "rb") as wav:
+        assert wav.readframes(wav.getnframes()) == b"001122"
+
+
+def test_wave_write_invalid_data(tmp_path):
     """When given invalid data to write to file, an exception is thrown."""
-    file = "test_wave_write_invalid_data.tmp"
-    with pytest.raises(Exception):
+    file = str(tmp_path / "test_wave_write_invalid_data.tmp")
+    with pytest.raises(TypeError):
         txsoundgen.audio.wave_write(file, "Not a byte object")
-    os.remove(file)
 
 
+@pytest.mark.network
 def test_polly_process_valid_string(client):
     """Given a valid string, Polly is able to process the request."""
     assert isinstance(
@@ -31,7 +48,107 @@ def test_polly_process_valid_string(client):
     )
 
 
+@pytest.mark.network
 def test_polly_process_invalid_string(client):
     """Given an invalid string, an error is returned."""
+    from botocore.exceptions import BotoCoreError, ClientError
+
     with pytest.raises((BotoCoreError, ClientError)):
         txsoundgen.audio.polly_process(client, "<ssml_invalid_tag>")
+
+
+def test_polly_stream_chunks(polly):
+    """Given a Polly response, the audio stream is yielded in chunks of the requested size."""
+    polly.add_audio(b"0123456789")
+    chunks = list(txsoundgen.audio.polly_stream(polly.client, "Test", chunk_size=4))
+    assert chunks == [b"0123", b"4567", b"89"]
+
+
+def test_polly_process_many(polly):
+    """Given several phrases, audio data is returned for each in the same order."""
+    for data in (b"one", b"two"):
+        polly.add_audio(data)
+    audio = txsoundgen.audio.polly_process_many(polly.client, ["1", "2"], max_workers=1)
+    assert audio == [b"one", b"two"]
+
+
+def test_polly_process_many_rate_limited(polly):
+    """Given more phrases than the rate allows at once, requests wait for the limiter."""
+    for _ in range(3):
+        polly.add_audio(b"00")
+    start = time.monotonic()
+    txsoundgen.audio.polly_process_many(
+        polly.client, ["1", "2", "3"], {"polly_tps": 2.5}
+    )
+    assert time.monotonic() - start >= 0.3
+
+
+def test_polly_process_client_error(polly):
+    """When Polly rejects a request, the client error is raised."""
+    from botocore.exceptions import ClientError
+
+    polly.add_error("InvalidClientTokenId")
+    with pytest.raises(ClientError):
+        txsoundgen.audio.polly_process(polly.client, "Test")
+
+
+def test_polly_stream_buffer(tmp_path, mime, polly):
+    """Given a reusable buffer, the audio stream is read into it and can be written to file."""
+    file = str(tmp_path / "test_polly_stream_buffer.tmp")
+    polly.add_audio(b"0123456789")
+    stream = txsoundgen.audio.polly_stream(polly.client, "Test", buffer=bytearray(4))
+    txsoundgen.audio.wave_write(file, stream)
+    assert mime.from_file(file) == "audio/x-wav"
+    with wave.open(file, "rb") as wav:
+        assert wav.readframes(wav.getnframes()) == b"0123456789"
+
+
+def test_polly_stream_reads_into_buffer(polly):
+    """Given a reusable buffer, each chunk is a view of the buffer rather than a copy."""
+    buffer = bytearray(4)
+    polly.add_audio(b"0123456789")
+    for chunk in txsoundgen.audio.polly_stream(polly.client, "Test", buffer=buffer):
+        assert isinstance(chunk, memoryview) and chunk.obj is buffer
+
+
+def test_polly_process_batch_splits_on_marks(polly):
+    """Given several phrases, the audio is split at the offset of each speech mark."""
+    marks = (
+        b'{"time":0,"type":"ssml","value":"0"}\n{"time":1,"type":"ssml","value":"1"}\n'
+    )
+    audio = b"0" * 32 + b"1" * 16
+    for data in (marks, audio):
+        polly.add_audio(data)
+    output = txsoundgen.audio.polly_process_batch(polly.client, ["Zero", "One"])
+    assert output == [b"0" * 32, b"1" * 16]
+
+
+def test_polly_stream_int_phrase(polly):
+    """Given a phrase which is a number, it is synthesised as text."""
+    polly.add_audio(
+        b"00", {**_REQUEST, "Text": '<speak>42<break strength="weak"/></speak>'}
+    )
+    assert b"".join(txsoundgen.audio.polly_stream(polly.client, 42)) == b"00"
+
+
+def test_polly_stream_without_trailing_break(polly):
+    """Given no trailing break in the configuration, no pause is added to the phrase."""
+    polly.add_audio(b"00", {**_REQUEST, "Text": "<speak>Test</speak>"})
+    config = {"trailing_break": None}
+    assert (
+        b"".join(txsoundgen.audio.polly_stream(polly.client, "Test", config)) == b"00"
+    )
+
+
+def test_polly_split_batches():
+    """Given phrases over the batch size or request length, they are split into batches."""
+    batches = txsoundgen.audio.polly_split_batches(["a", "b", "c"], 2)
+    assert list(batches) == [[0, 1], [2]]
+    phrases = ["x" * 2000] * 3
+    assert list(txsoundgen.audio.polly_split_batches(phrases, 10)) == [[0], [1], [2]]
+
+
+def test_polly_process_batch_rejects_marks(polly):
+    """Given a phrase containing a mark, it is not synthesised in a batch."""
+    with pytest.raises(ValueError):
+        txsoundgen.audio.polly_process_batch(polly.client, ['<mark name="x"/>Mark'])
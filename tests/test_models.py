@@ -1,11 +1,11 @@
 """Tests relating to txsoundgen.model."""
-import os
+import pytest
 
-# import pytest
 import txsoundgen.model
-from tests import fixture_client  # pylint: disable=W0611
+from tests import fixture_cache, fixture_client, fixture_polly  # noqa: F401
 
 
+@pytest.mark.network
 def test_sound_creation(client):
     """When the sound.render method is called, the object has a .data attribute containing bytes."""
     test = txsoundgen.model.Sound("Test Sound Creation")
@@ -21,10 +21,167 @@ def test_sound_config_override():
     assert test.config["language"] == "en-US"
 
 
-def test_sound_process_path(client):
+@pytest.mark.network
+def test_sound_process_path(client, tmp_path):
     """Given a filename without an appropriate extension, '.wav' is added to the filename."""
-    badfile = "test_sound_process_path"
+    badfile = str(tmp_path / "test_sound_process_path")
     goodfile = badfile + ".wav"
     test = txsoundgen.model.Sound("Test Sound Process")
     assert test.process(client, badfile) == goodfile
-    os.remove(goodfile)
+
+
+def test_init_db_creates_cache(cache, tmp_path):
+    """When the cache is initialised, the database file and its tables are created."""
+    assert (tmp_path / "cache" / "cache.db").exists()
+    assert cache.table_exists("sound")
+
+
+def test_bare_db_init_caches_next_to_database(tmp_path):
+    """Given a database initialised without init_db, audio data is cached next to it."""
+    db = txsoundgen.model.db
+    db.init(str(tmp_path / "bare.db"))
+    try:
+        db.create_tables([txsoundgen.model.CachedSound])
+        sound = txsoundgen.model.Sound("Test Bare Database")
+        sound.data = b"00"
+        assert sound.save_cache() is True
+        assert len(list((tmp_path / "blobs").rglob("*.pcm"))) == 1
+    finally:
+        db.close()
+        db.init(None)
+
+
+def test_init_db_memory_removes_blobs_on_reinit(tmp_path):
+    """Given an in-memory cache, its temporary blob directory is removed on re-init."""
+    db = txsoundgen.model.init_db(":memory:")
+    try:
+        sound = txsoundgen.model.Sound("Test Memory Blobs")
+        sound.data = b"00"
+        sound.save_cache()
+        blobs = txsoundgen.model.blob_path("0" * 64).parent.parent
+        assert blobs.exists()
+        txsoundgen.model.init_db(str(tmp_path / "cache.db"))
+        assert not blobs.exists()
+    finally:
+        db.close()
+        db.init(None)
+
+
+def test_prune_cache_evicts_least_recently_used(cache, tmp_path):
+    """Given a cache over the size limit, the least recently used entries are evicted."""
+    for phrase in ("old", "new"):
+        sound = txsoundgen.model.Sound(phrase)
+        sound.data = phrase.encode() * 1024
+        sound.save_cache()
+    txsoundgen.model.memory_cache.clear()
+    assert txsoundgen.model.Sound("old").check_cache() is True
+    assert txsoundgen.model.prune_cache(4 / 1024) == 1
+    assert txsoundgen.model.Sound("old").check_cache() is True
+    assert txsoundgen.model.Sound("new").check_cache() is False
+    assert len(list((tmp_path / "cache" / "blobs").rglob("*.pcm"))) == 1
+
+
+def test_sound_cache_keyed_by_trailing_break(cache):
+    """Given saved audio data, a sound with a different trailing break does not use it."""
+    saved = txsoundgen.model.Sound("Test Sound Break")
+    saved.data = b"00"
+    saved.save_cache()
+    txsoundgen.model.memory_cache.clear()
+    unbroken = txsoundgen.model.Sound("Test Sound Break", {"trailing_break": None})
+    assert unbroken.check_cache() is False
+
+
+def test_sound_cache_round_trip(cache):
+    """Given saved audio data, an identical sound loads it from the cache."""
+    saved = txsoundgen.model.Sound("Test Sound Cache")
+    saved.data = b"00"
+    assert saved.save_cache() is True
+    assert saved.save_cache() is True  # Duplicate entries are ignored
+    loaded = txsoundgen.model.Sound("Test Sound Cache")
+    assert loaded.check_cache() is True
+    assert loaded.data == b"00"
+    entry = txsoundgen.model.CachedSound.get()
+    assert (entry.sample_rate, entry.channels, entry.sample_width) == (16000, 1, 2)
+    assert (
+        txsoundgen.model.Sound("Test Sound Cache", {"voice": "Brian"}).check_cache()
+        is False
+    )
+
+
+def test_sound_cache_missing_blob(cache):
+    """Given a cache entry whose audio data file is missing, it is treated as a miss."""
+    saved = txsoundgen.model.Sound("Test Missing Blob")
+    saved.data = b"00"
+    assert saved.save_cache() is True
+    txsoundgen.model.memory_cache.clear()
+    sha = txsoundgen.model.CachedSound.get().sha
+    txsoundgen.model.blob_path(sha).unlink()
+    assert txsoundgen.model.Sound("Test Missing Blob").check_cache() is False
+
+
+def test_persister_writes_in_background(cache, tmp_path):
+    """Given a sound with audio data, it is written to file and cached by the persister."""
+    sound = txsoundgen.model.Sound("Test Persister")
+    sound.data = b"00"
+    other = txsoundgen.model.Sound("Test Persister", {"voice": "Brian"})
+    other.data = b"11"
+    with txsoundgen.model.Persister(batch_size=1) as persister:
+        file = sound.process(None, str(tmp_path / "test_persister"), persister)
+        persister.save(sound)
+        persister.save(other)
+    assert (tmp_path / "test_persister.wav").exists()
+    assert file == str(tmp_path / "test_persister.wav")
+    assert txsoundgen.model.Sound("Test Persister").check_cache() is True
+    assert (
+        txsoundgen.model.Sound("Test Persister", {"voice": "Brian"}).check_cache()
+        is True
+    )
+
+
+def test_persister_raises_errors(tmp_path):
+    """When a queued write fails, the error is raised once the persister is closed."""
+    sound = txsoundgen.model.Sound("Test Persister Error")
+    sound.data = "Not a byte object"
+    with pytest.raises(TypeError), txsoundgen.model.Persister() as persister:
+        persister.write(str(tmp_path / "test_persister_error.wav"), sound)
+
+
+def test_memory_cache_evicts_least_recently_used():
+    """Given a memory cache over its entry limit, the least recently used entry is evicted."""
+    cache = txsoundgen.model.MemoryCache(max_entries=2)
+    cache.put(("a",), b"a")
+    cache.put(("b",), b"b")
+    assert cache.get(("a",)) == b"a"
+    cache.put(("c",), b"c")
+    assert cache.get(("b",)) is None
+    assert cache.get(("a",)) == b"a" and cache.get(("c",)) == b"c"
+
+
+def test_memory_cache_size_limit():
+    """Given a memory cache over its size limit, entries are evicted until it fits."""
+    cache = txsoundgen.model.MemoryCache(max_size_mb=2 / 1024)
+    cache.put(("a",), b"0" * 1024)
+    cache.put(("b",), b"0" * 1536)
+    assert cache.get(("a",)) is None
+    assert cache.get(("b",)) is not None
+
+
+def test_sound_render_streams_to_file(tmp_path, polly):
+    """Given a file, rendered audio is written to it and kept as the sound's data."""
+    file = tmp_path / "test_sound_render.wav"
+    polly.add_audio(b"0" * 10000)
+    test = txsoundgen.model.Sound("Test Sound Render")
+    assert test.render(polly.client, str(file)) == b"0" * 10000
+    assert file.exists()
+
+
+def test_sound_render_error_leaves_no_file(tmp_path, polly):
+    """When Polly rejects a request, no partially written file is left behind."""
+    from botocore.exceptions import ClientError
+
+    polly.add_error("ThrottlingException")
+    with pytest.raises(ClientError):
+        txsoundgen.model.Sound("Test Render Error").render(
+            polly.client, str(tmp_path / "test_render_error.wav")
+        )
+    assert not list(tmp_path.iterdir())
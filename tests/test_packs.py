@@ -1,11 +1,15 @@
 """Tests relating to txsoundgen.pack."""
-import os
+import pathlib
+
 import pytest
-from txsoundgen.pack import Pack
+
+import txsoundgen.model
+from tests import fixture_cache, fixture_client, fixture_polly  # noqa: F401
 from txsoundgen.model import Sound
+from txsoundgen.pack import Pack
 
 
-@pytest.fixture(name="pack")
+@pytest.fixture(name="pack", scope="module")
 def fixture_pack():
     """Valid Pack object."""
     return Pack({})
@@ -22,10 +26,10 @@ def test_pack_format_filename(pack):
         ("spa ce", "space"),  # Contains whitespace
     ]
     for string in safe:
-        if pack._format_filename(string) != string:  # pylint: disable=W0212
+        if pack._format_filename(string) != string:
             errors.append(string)
     for string, expected in not_safe:
-        if pack._format_filename(string) != expected:  # pylint: disable=W0212
+        if pack._format_filename(string) != expected:
             errors.append(string)
     assert not errors, f"Incorrect response for {','.join(errors)}"
 
@@ -34,20 +38,169 @@ def test_pack_convert_list(pack):
     """Given a dictionary of sound groups, they are converted correctly."""
     errors = []
     original = {"test": {"valid": "string", "converted": "string"}}
-    converted = pack._convert_list(original)["test"]  # pylint: disable=W0212
-    if not "valid" in converted:
+    converted = pack._convert_list(original)["test"]
+    if "valid" not in converted:
         errors.append("Valid key")
-    if not "conver" in converted:
+    if "conver" not in converted:
         errors.append("Converted key")
     if "conver" in converted and not isinstance(converted["conver"], Sound):
         errors.append("oo")
     assert not errors, f"Incorrect response for {','.join(errors)}"
 
 
-def test_pack_generate(pack):
+@pytest.mark.network
+def test_pack_generate(pack, tmp_path):
     """Given a Sound object and configuration, a sound file is generated."""
-    file = "test_pack_generate.wav"
+    file = tmp_path / "test_pack_generate.wav"
     obj = Sound("test")
-    pack._generate(file, obj)  # pylint: disable=W0212
-    assert os.path.exists(file) is True
-    os.remove(file)
+    pack._generate(str(file), obj)
+    assert file.exists() is True
+
+
+def test_pack_process(cache, polly, tmp_path):
+    """Given a pack configuration, every sound is written to its group directory in order."""
+    for data in (b"00", b"11"):
+        polly.add_audio(data)
+    pack = Pack({"sounds": {"test": {"one": "One", "two": "Two"}}})
+    pack.client = polly.client
+    files = pack.process(str(tmp_path))
+    assert files == [str(tmp_path / "test" / f"{name}.wav") for name in ("one", "two")]
+    assert all((tmp_path / "test" / f"{name}.wav").exists() for name in ("one", "two"))
+
+
+@pytest.mark.network
+def test_pack_process_polly(client, cache, tmp_path):
+    """Given a pack configuration, every sound is synthesised by Polly and written to disk."""
+    pack = Pack({"sounds": {"test": {"one": "One", "two": "Two"}}})
+    pack.client = client
+    files = pack.process(str(tmp_path))
+    assert files == [str(tmp_path / "test" / f"{name}.wav") for name in ("one", "two")]
+    assert all((tmp_path / "test" / f"{name}.wav").exists() for name in ("one", "two"))
+
+
+def test_pack_setup(cache, tmp_path):
+    """Given a pack configuration, group directories are created and every sound is listed."""
+    conf = {"sounds": {"a": {"1": "1"}, "b": {"2": "2"}}}
+    worklist = Pack(conf)._setup(str(tmp_path / "pack"))
+    assert [file for file, _ in worklist] == [
+        str(tmp_path / "pack" / "a" / "1.wav"),
+        str(tmp_path / "pack" / "b" / "2.wav"),
+    ]
+    assert (tmp_path / "pack" / "a").is_dir() and (tmp_path / "pack" / "b").is_dir()
+
+
+def test_pack_warm_cache(cache):
+    """Given some sounds in the cache, their audio data is loaded before processing."""
+    cached = Sound("cached")
+    cached.data = b"00"
+    cached.save_cache()
+    pack = Pack({"sounds": {"test": {"hit": "cached", "miss": "not cached"}}})
+    sounds = pack.list["test"]
+    assert pack._warm_cache(list(sounds.values())) == 1
+    assert b"".join(sounds["hit"].audio()) == b"00"
+    assert sounds["miss"].has_data is False
+    saved = Sound("not cached")
+    saved.data = b"11"
+    saved.save_cache()
+    txsoundgen.model.memory_cache.clear()
+    assert sounds["miss"].check_cache() is False  # Known miss, not looked up again
+
+
+def test_pack_convert_list_shares_phrases(pack):
+    """Given the same phrase under several names, they share a single Sound object."""
+    original = {"a": {"one": "repeat"}, "b": {"two": "repeat", "three": "other"}}
+    converted = pack._convert_list(original)
+    assert converted["a"]["one"] is converted["b"]["two"]
+    assert converted["b"]["three"] is not converted["b"]["two"]
+
+
+def test_pack_repr():
+    """When a voice pack is represented, only its name is included."""
+    assert (
+        repr(Pack({"name": "test", "sounds": {"a": {"one": "x"}}}))
+        == "Pack(name='test')"
+    )
+
+
+def test_pack_json_round_trip():
+    """Given a voice pack serialised to JSON, an identical voice pack is loaded from it."""
+    original = Pack({"name": "test", "sounds": {"a": {"one": "phrase"}}})
+    loaded = Pack.from_json(original.to_json())
+    assert loaded.config == original.config
+    assert loaded.list["a"]["one"].phrase == "phrase"
+
+
+def test_pack_process_cached(cache, tmp_path):
+    """Given cached sounds, the pack is written to disk without creating a Polly client."""
+    cached = Sound("repeat")
+    cached.data = b"00"
+    cached.save_cache()
+    pack = Pack({"sounds": {"a": {"one": "repeat"}, "b": {"two": "repeat"}}})
+    files = pack.process(str(tmp_path))
+    assert files == [str(tmp_path / "a" / "one.wav"), str(tmp_path / "b" / "two.wav")]
+    assert all(pathlib.Path(file).exists() for file in files)
+    assert "client" not in vars(pack)
+
+
+def test_pack_process_prunes_cache(cache, monkeypatch, tmp_path):
+    """When a pack has been generated, the cache is pruned to the default size limit."""
+    limits = []
+    monkeypatch.setattr(txsoundgen.model, "prune_cache", limits.append)
+    cached = Sound("pruned")
+    cached.data = b"00"
+    cached.save_cache()
+    Pack({"sounds": {"a": {"one": "pruned"}}}).process(str(tmp_path))
+    assert limits == [10]
+
+
+def test_pack_process_batch_unique_phrases(cache, polly, tmp_path):
+    """Given a phrase used by several files, it is only synthesised once per batch."""
+    texts = []
+    polly.client.meta.events.register(
+        "provide-client-params.polly.SynthesizeSpeech",
+        lambda params, **_: texts.append(params["Text"]),
+    )
+    marks = (
+        b'{"time":0,"type":"ssml","value":"0"}\n{"time":1,"type":"ssml","value":"1"}\n'
+    )
+    for data in (marks, b"0" * 32 + b"1" * 16):
+        polly.add_audio(data)
+    sounds = {"a": {"one": "repeat", "two": "repeat"}, "b": {"three": "repeat"}}
+    sounds["b"]["four"] = "other"
+    pack = Pack({"sounds": sounds})
+    pack.client = polly.client
+    files = pack.process(str(tmp_path), batch_size=10)
+    assert len(files) == 4 and all(pathlib.Path(file).exists() for file in files)
+    assert len(texts) == 2 and all(text.count("repeat") == 1 for text in texts)
+    txsoundgen.model.memory_cache.clear()
+    assert Sound("repeat").check_cache() is True  # Saved by the persister
+
+
+def test_pack_process_memory_cache(polly, tmp_path):
+    """Given an in-memory cache, sounds generated by every thread are saved to it."""
+    for data in (b"00", b"11"):
+        polly.add_audio(data)
+    pack = Pack({"cache": ":memory:", "sounds": {"a": {"one": "One", "two": "Two"}}})
+    pack.client = polly.client
+    try:
+        files = pack.process(str(tmp_path), workers=2)
+        assert all(pathlib.Path(file).exists() for file in files)
+        txsoundgen.model.memory_cache.clear()
+        assert Sound("One").check_cache() is True and Sound("Two").check_cache() is True
+    finally:
+        txsoundgen.model.db.close()
+        txsoundgen.model.db.init(None)
+
+
+def test_pack_process_batch_skips_marks(cache, polly, tmp_path):
+    """Given a phrase containing a mark, it is synthesised in a request of its own."""
+    texts = []
+    polly.client.meta.events.register(
+        "provide-client-params.polly.SynthesizeSpeech",
+        lambda params, **_: texts.append(params["Text"]),
+    )
+    polly.add_audio(b"00")
+    pack = Pack({"sounds": {"a": {"one": '<mark name="x"/>Mark'}}})
+    pack.client = polly.client
+    pack.process(str(tmp_path), batch_size=10)
+    assert texts == ['<speak><mark name="x"/>Mark<break strength="weak"/></speak>']
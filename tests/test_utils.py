@@ -1,4 +1,9 @@
 """Tests relating to txsoundgen.utils."""
+import time
+import types
+
+import pytest
+
 import txsoundgen.utils
 
 
@@ -13,3 +18,43 @@ def test_merge_config_merge():
         txsoundgen.utils.merge_config({"language": "en-US"})
         != txsoundgen.utils.default_config
     )
+
+
+def test_merge_config_empty_is_read_only():
+    """Given an empty configuration, the returned default configuration cannot be modified."""
+    config = txsoundgen.utils.merge_config()
+    with pytest.raises(TypeError):
+        config["language"] = "en-US"
+    assert txsoundgen.utils.default_config["language"] == "en-GB"
+
+
+def test_merge_config_shared():
+    """Given equal configurations, the same read-only merged configuration is returned."""
+    first = txsoundgen.utils.merge_config({"language": "en-US", "voice": "Joanna"})
+    second = txsoundgen.utils.merge_config({"voice": "Joanna", "language": "en-US"})
+    assert first is second
+    assert first["engine"] == "standard"
+    unhashable = txsoundgen.utils.merge_config({"sounds": {}})
+    assert isinstance(unhashable, types.MappingProxyType)
+
+
+def test_rate_limiter_waits_for_token():
+    """Given an empty bucket, acquiring a token waits until one is available."""
+    limiter = txsoundgen.utils.RateLimiter(20, burst=1)
+    start = time.monotonic()
+    for _ in range(3):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.09
+
+
+def test_rate_limiter_shared():
+    """Given the same rate, the same rate limiter is returned."""
+    assert txsoundgen.utils.rate_limiter(8) is txsoundgen.utils.rate_limiter(8)
+    assert txsoundgen.utils.rate_limiter(8) is not txsoundgen.utils.rate_limiter(4)
+
+
+def test_freeze_config_reused():
+    """Given a frozen configuration, merging it again returns the same object."""
+    config = txsoundgen.utils.freeze_config({"language": "en-US"})
+    assert config["language"] == "en-US"
+    assert txsoundgen.utils.merge_config(config) is config
@@ -1,17 +1,31 @@
 """.. include:: ../README.md"""
-import os
 import logging
-import coloredlogs
+import os
 
+import coloredlogs
 
 loglevel = os.environ.get("TXSOUNDGEN_LOG_LEVEL", "DEBUG").upper()
 logger = logging.getLogger(__name__)
 # logger = logging.getLogger()
-logger.setLevel(loglevel)
 
 # fmt = logging.Formatter('%(asctime)s [%(levelname)s] [%(name)s] %(message)s','%Y-%m-%d %H:%M:%S')
 LOGFORMAT = "%(asctime)s [%(levelname)s] [%(name)s] %(message)s"
-coloredlogs.install(level="DEBUG", logger=logger, fmt=LOGFORMAT)
+
+
+def _configure_logging():
+    """Installs coloured log output on the package logger.
+
+    The flag is stored on the logger itself rather than in this module, so that
+    re-importing or reloading the package does not install a second handler.
+    """
+    if getattr(logger, "_txsoundgen_configured", False):
+        return
+    logger.setLevel(loglevel)
+    coloredlogs.install(level="DEBUG", logger=logger, fmt=LOGFORMAT)
+    logger._txsoundgen_configured = True
+
+
+_configure_logging()
 # stdout_handler = logging.StreamHandler()
 # stdout_handler.setLevel(loglevel)
 # stdout_handler.setFormatter(fmt)
@@ -2,6 +2,8 @@
 # import yaml
 import boto3
 
+from txsoundgen.pack import Pack
+
 client = boto3.client("polly")
 
 
@@ -32,7 +34,5 @@ client = boto3.client("polly")
 
 data = {"sounds": {"system": {"1": "Hello"}, "extra": {"weirdlong": "Goodbye"}}}
 
-from txsoundgen.pack import Pack
-
 pack = Pack(data)
 print(pack.list)
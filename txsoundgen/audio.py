@@ -2,19 +2,89 @@
 This sub-module contains low level functions for the creation and processing of audio data directly.
 
 Contents:
+    - `polly_client()` - Shared boto3 client for communicating with Amazon Polly.
     - `polly_process()` - Manage generation and processing of text-to-speech via Amazon Polly.
+    - `polly_stream()` - Streams text-to-speech audio data from Amazon Polly in chunks.
+    - `polly_process_batch()` - Synthesises several phrases with a single Polly request.
+    - `polly_split_batches()` - Splits phrases into batches for `polly_process_batch()`.
+    - `polly_process_many()` - Synthesises several phrases with concurrent Polly requests.
     - `wave_write()` - Writes WAVE-encoded audio data to a file path, or file-like object.
 """
+import functools
+import json
 import logging
+import threading
 import wave
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import closing
+
 from botocore.exceptions import BotoCoreError, ClientError
 
 import txsoundgen.utils
 
-
 logger = logging.getLogger(__name__)
 
+CHUNK_SIZE = 4096
+"""Size in bytes of the chunks audio data is streamed in."""
+
+SAMPLE_RATE = 16000
+"""Sample rate in Hz of generated audio, as supported by EdgeTX / OpenTX radios."""
+SAMPLE_WIDTH = 2
+"""Size in bytes of each audio sample (16-bit PCM)."""
+CHANNELS = 1
+"""Number of audio channels in generated audio (mono)."""
+
+MAX_REQUEST_CHARACTERS = 6000
+"""Maximum length of the SSML document in a single Polly request, including tags."""
+MAX_BILLED_CHARACTERS = 3000
+"""Maximum number of billed characters, excluding SSML tags, in a single Polly request."""
+
+_SAMPLE_RATE_PARAM = str(SAMPLE_RATE)
+_WAVE_PARAMS = (CHANNELS, SAMPLE_WIDTH, SAMPLE_RATE, 0, "NONE", "not compressed")
+
+_SSML_PREFIX = "<speak>"
+_SSML_END = "</speak>"
+
+_client_lock = threading.Lock()
+
+
+def _ssml_break(config):
+    """SSML for the pause added after each phrase, so clips don't end abruptly."""
+    strength = config.get("trailing_break")
+    return f'<break strength="{strength}"/>' if strength else ""
+
+
+@functools.lru_cache(maxsize=None)
+def _polly_client():
+    import boto3
+    from botocore.config import Config
+
+    # Keeps enough pooled connections for concurrent workers to re-use, and backs off
+    # adaptively when Polly throttles requests.
+    return boto3.client(
+        "polly",
+        config=Config(
+            max_pool_connections=32,
+            retries={"mode": "adaptive", "max_attempts": 3},
+        ),
+    )
+
+
+def polly_client():
+    """Shared boto3 client for communicating with the Amazon Polly service.
+
+    Creating a client loads boto3's service data and resolves credentials, so a single
+    client is created on first use and shared by every caller. Botocore clients are
+    thread-safe once created.
+
+    Returns:
+        botocore.client.Polly: The shared client.
+    """
+    # boto3's default session is not thread-safe, and the client may first be needed
+    # from several worker threads at once.
+    with _client_lock:
+        return _polly_client()
+
 
 def polly_process(client: object, phrase: str, config: dict = None):
     """Manage generation and processing of text-to-speech via Amazon Polly.
@@ -56,6 +126,11 @@ def polly_process(client: object, phrase: str, config: dict = None):
         - `language`:
             Specifies the language code, useful if using a bi-lingual voice. See
             [DescribeVoices](https://docs.aws.amazon.com/polly/latest/dg/API_DescribeVoices.html).
+        - `trailing_break`:
+            Strength of the pause added after the phrase, such as `weak` or `strong`,
+            or `None` for no pause. See
+            [break](https://docs.aws.amazon.com/polly/latest/dg/supportedtags.html#break-tag).
+            Defaults to `weak`.
 
     Example:
         ```python
@@ -68,14 +143,103 @@ def polly_process(client: object, phrase: str, config: dict = None):
 
         ```
     """
+    return b"".join(polly_stream(client, phrase, config))
+
+
+def polly_process_many(
+    client: object, phrases: list, config: dict = None, max_workers: int = 8
+):
+    """Synthesises several phrases with concurrent Polly requests.
+
+    Behaves as `polly_process()` for each phrase, but overlaps the requests rather than
+    waiting for each response in turn. Botocore clients are thread-safe, so the same
+    client is shared by every request; its `max_pool_connections` should be at least
+    `max_workers` to avoid waiting for a connection.
+
+    Each request takes a token from the shared limiter for `polly_tps` first, the same
+    as `txsoundgen.model.Sound.render()`, so the combined request rate stays within the
+    configured quota. See `txsoundgen.utils.RateLimiter`.
+
+    Args:
+        client (botocore.client.Polly):
+            A boto3 client object for communicating with the Amazon Polly service.
+        phrases (list):
+            The (optionally SSML-enabled) text phrases that should be synthesised.
+        config (dict, optional):
+            Dictionary containting optional configuration parameters.
+            See `polly_process()`.
+        max_workers (int, optional): Maximum number of concurrent requests.
+
+    Returns:
+        list: Byte objects containing the generated audio data, in order of `phrases`.
+
+    Raises:
+        RunTimeError
+    """
+    config = txsoundgen.utils.merge_config(config)
+    limiter = txsoundgen.utils.rate_limiter(config["polly_tps"])
+
+    def process(phrase):
+        limiter.acquire()
+        return polly_process(client, phrase, config)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(process, phrases))
+
+
+def _stream_readinto(stream):
+    """Returns a function reading the response stream into a buffer, if it has one."""
+    if hasattr(stream, "readinto"):
+        return stream.readinto
+    # Older botocore's StreamingBody has no readinto(), but the urllib3 response it
+    # wraps does. Reading it directly skips botocore's check of the content length.
+    return getattr(getattr(stream, "_raw_stream", None), "readinto", None)
+
+
+def polly_stream(
+    client: object,
+    phrase: str,
+    config: dict = None,
+    chunk_size: int = CHUNK_SIZE,
+    buffer: bytearray = None,
+):
+    """Streams text-to-speech audio data from Amazon Polly in chunks.
+
+    Behaves as `polly_process()`, but yields the audio data as it is received rather
+    than buffering the whole response, so it can be written out by `wave_write()`
+    while the rest of the response is still being read.
+
+    Args:
+        client (botocore.client.Polly):
+            A boto3 client object for communicating with the Amazon Polly service.
+        phrase (string):
+            The (optionally SSML-enabled) text phrase that should be
+            synthesised.
+        config (dict, optional):
+            Dictionary containting optional configuration parameters.
+            See `polly_process()`.
+        chunk_size (int, optional): Maximum size in bytes of each chunk.
+        buffer (bytearray, optional):
+            Reusable buffer to read audio data into, avoiding an allocation per chunk.
+            When provided, chunks are up to the size of the buffer, and are yielded as
+            `memoryview` slices of it which are only valid until the next chunk is
+            requested. Suitable for passing directly to `wave_write()`. If the response
+            can't be read into a buffer, chunks are yielded as if none was given.
+
+    Yields:
+        bytes: Chunks of the generated audio data.
+
+    Raises:
+        RunTimeError
+    """
     config = txsoundgen.utils.merge_config(config)
-    ssml = f'<speak>{phrase}<break strength="weak"/></speak>'
+    ssml = f"{_SSML_PREFIX}{phrase}{_ssml_break(config)}{_SSML_END}"
     try:
         logger.debug('Requesting synthesis of "%s" from AWS Polly', phrase)
         response = client.synthesize_speech(
             Engine=config["engine"],
             LanguageCode=config["language"],
-            SampleRate=str(16000),
+            SampleRate=_SAMPLE_RATE_PARAM,
             VoiceId=config["voice"],
             Text=ssml,
             TextType="ssml",
@@ -87,15 +251,143 @@ def polly_process(client: object, phrase: str, config: dict = None):
         raise error
     if "AudioStream" in response:
         with closing(response["AudioStream"]) as stream:
-            output = stream.read()
+            readinto = _stream_readinto(stream) if buffer is not None else None
+            if readinto is None:
+                yield from stream.iter_chunks(chunk_size)
+            else:
+                view = memoryview(buffer)
+                while True:
+                    size = readinto(view)
+                    if not size:
+                        break
+                    yield view[:size]
             logger.debug('Successfully completed synthesis of "%s"', phrase)
-            return output
     else:
         logger.error('Could not stream audio for "%s"', phrase)
         raise RuntimeError("AWS Polly response did not contain AudioStream key")
 
 
-def wave_write(file: str, data: bytes):
+def polly_process_batch(client: object, phrases: list, config: dict = None):
+    """Synthesises several phrases with a single Polly request.
+
+    Each Polly request carries the overhead of a full HTTPS round-trip, which dominates
+    for the short phrases that make up most voice packs. The phrases are joined into a
+    single SSML document, separated by `<mark>` tags, and synthesised as one. Polly is
+    then asked for the SSML speech marks of the same document, which give the time each
+    mark was reached, and the audio data is split at those offsets.
+
+    *See [Speech marks](https://docs.aws.amazon.com/polly/latest/dg/speechmarks.html).*
+
+    Args:
+        client (botocore.client.Polly):
+            A boto3 client object for communicating with the Amazon Polly service.
+        phrases (list):
+            The (optionally SSML-enabled) text phrases that should be synthesised. These
+            must all fit within a single Polly request, see `polly_split_batches()`, and
+            can't contain `<mark>` tags of their own as they would be mistaken for the
+            boundaries between phrases.
+        config (dict, optional):
+            Dictionary containting optional configuration parameters.
+            See `polly_process()`.
+
+    Returns:
+        list: A byte object containing the generated audio data for each phrase, in the
+        same order as `phrases`.
+
+    Raises:
+        RunTimeError
+        ValueError: If a phrase contains a `<mark>` tag.
+    """
+    config = txsoundgen.utils.merge_config(config)
+    if any("<mark" in str(phrase) for phrase in phrases):
+        raise ValueError(
+            "Phrases containing <mark> tags can't be synthesised in a batch"
+        )
+    pause = _ssml_break(config)
+    ssml = "".join(
+        _batch_entry(index, phrase, pause) for index, phrase in enumerate(phrases)
+    )
+    request = {
+        "Engine": config["engine"],
+        "LanguageCode": config["language"],
+        "SampleRate": _SAMPLE_RATE_PARAM,
+        "VoiceId": config["voice"],
+        "Text": _SSML_PREFIX + ssml + _SSML_END,
+        "TextType": "ssml",
+    }
+    try:
+        logger.debug("Requesting synthesis of %s phrases from AWS Polly", len(phrases))
+        marks = client.synthesize_speech(
+            **request, OutputFormat="json", SpeechMarkTypes=["ssml"]
+        )
+        audio = client.synthesize_speech(**request, OutputFormat="pcm")
+    except (BotoCoreError, ClientError) as error:
+        logger.critical(error)
+        raise error
+    if "AudioStream" not in marks or "AudioStream" not in audio:
+        logger.error("Could not stream audio for %s phrases", len(phrases))
+        raise RuntimeError("AWS Polly response did not contain AudioStream key")
+    with closing(marks["AudioStream"]) as stream:
+        offsets = {}
+        for line in stream.iter_lines():
+            mark = json.loads(line)
+            offsets[int(mark["value"])] = (
+                mark["time"] * SAMPLE_RATE // 1000 * SAMPLE_WIDTH
+            )
+    if len(offsets) != len(phrases):
+        raise RuntimeError("AWS Polly did not return a speech mark for every phrase")
+    with closing(audio["AudioStream"]) as stream:
+        data = stream.read()
+    bounds = [offsets[index] for index in range(len(phrases))] + [len(data)]
+    logger.debug("Successfully completed synthesis of %s phrases", len(phrases))
+    return [data[start:end] for start, end in zip(bounds, bounds[1:])]
+
+
+def _batch_entry(index: int, phrase, pause: str):
+    """SSML for a phrase in a batch, preceded by the mark its audio is split at."""
+    return f'<mark name="{index}"/>{phrase}{pause}'
+
+
+def polly_split_batches(phrases: list, batch_size: int, config: dict = None):
+    """Splits phrases into batches which each fit in a single Polly request.
+
+    Polly limits both the length of the SSML document in each request and the number of
+    characters billed for it, see `MAX_REQUEST_CHARACTERS` and `MAX_BILLED_CHARACTERS`.
+    Billed characters are counted as the whole of each phrase, so phrases with SSML tags
+    of their own are over-estimated rather than risking a rejected request.
+
+    Args:
+        phrases (list): The text phrases that should be synthesised.
+        batch_size (int): Maximum number of phrases in each batch.
+        config (dict, optional):
+            Dictionary containting optional configuration parameters.
+            See `polly_process()`.
+
+    Yields:
+        list: Indexes into `phrases` of each batch, in order.
+    """
+    pause = _ssml_break(txsoundgen.utils.merge_config(config))
+    empty = len(_SSML_PREFIX) + len(_SSML_END)
+    batch, length, billed = [], empty, 0
+    for index, phrase in enumerate(phrases):
+        text = str(phrase)
+        size = len(_batch_entry(len(batch), text, pause))
+        if batch and (
+            len(batch) >= batch_size
+            or length + size > MAX_REQUEST_CHARACTERS
+            or billed + len(text) > MAX_BILLED_CHARACTERS
+        ):
+            yield batch
+            batch, length, billed = [], empty, 0
+            size = len(_batch_entry(0, text, pause))
+        batch.append(index)
+        length += size
+        billed += len(text)
+    if batch:
+        yield batch
+
+
+def wave_write(file: str, data):
     """Writes WAVE-encoded audio data to a file path, or file-like object.
 
     Creates mono-channel audio audio at 16kHz, which is what is supported by
@@ -103,7 +395,8 @@ def wave_write(file: str, data: bytes):
 
     Args:
         file (string/file-like object): File path to write audio data to.
-        data (bytes): Audio data to write.
+        data (bytes/iterable): Audio data to write, or an iterable of chunks of audio
+            data such as the output of `polly_stream()`.
 
     Raises:
         IOError
@@ -127,10 +420,12 @@ def wave_write(file: str, data: bytes):
     """
     try:
         with wave.open(file, "wb") as wav:
-            wav.setnchannels(1)
-            wav.setsampwidth(2)
-            wav.setframerate(16000)
-            wav.writeframes(data)
+            wav.setparams(_WAVE_PARAMS)
+            if isinstance(data, (bytes, bytearray, memoryview)):
+                wav.writeframes(data)
+            else:
+                for chunk in data:
+                    wav.writeframesraw(chunk)
         logger.debug('Wrote audio data to "%s"', str(file))
         return file
     except Exception as error:
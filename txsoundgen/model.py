@@ -2,11 +2,26 @@
 This sub-module contains objects for the storage, retrieval, and generation of text-to-speech data.
 
 Contents:
+    - `MemoryCache` - In-process LRU cache of audio data, in front of `CachedSound`.
+    - `Persister` - Writes audio files and cache entries on a background thread.
+    - `init_db()` - Opens the persistent cache database and creates its tables.
+    - `blob_path()` - Path cached audio data with a given hash is stored at.
+    - `prune_cache()` - Evicts the least recently used cache entries over a size limit.
     - `CachedSound` - Store and retrive cached audio data.
     - `Sound` - Generate WAVE-encoded audio data and store it to file, or use cached data.
 """
+import atexit
+import collections
+import datetime
+import hashlib
 import logging
-import re
+import os
+import pathlib
+import queue
+import shutil
+import tempfile
+import threading
+
 import peewee
 
 import txsoundgen.audio
@@ -23,6 +38,29 @@ See the
 for more details.
 """
 
+CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "txsoundgen", "cache.db")
+"""Default location of the persistent cache database.
+
+Can be overridden with the `TXSOUNDGEN_CACHE` environment variable.
+"""
+
+CACHE_PRAGMAS = {
+    "journal_mode": "wal",
+    "synchronous": "normal",
+    "cache_size": -64000,
+    "temp_store": "memory",
+    "mmap_size": 268435456,
+}
+"""SQLite settings used for the cache database.
+
+Write-ahead logging allows concurrent readers alongside a writer, which suits sounds
+being generated by several threads at once, and `synchronous=normal` avoids an `fsync`
+on every write. The remaining settings keep more of the database in memory.
+"""
+
+
+_CACHE_KEY = ("engine", "language", "voice", "service", "trailing_break", "phrase")
+
 
 class CachedSound(peewee.Model):
     """Store and retrieve cached audio data.
@@ -57,14 +95,268 @@ class CachedSound(peewee.Model):
     """
     phrase = peewee.TextField()
     """Phrase which has been synthesised into sound data."""
-    data = peewee.BlobField(unique=True)
-    """Byte data for WAVE-encoded audio file generated based on the phrase and generator config."""
+    trailing_break = peewee.CharField(
+        default=txsoundgen.utils.default_config["trailing_break"]
+    )
+    """Strength of the pause synthesised after the phrase, empty if there is none."""
+    sha = peewee.CharField(unique=True)
+    """SHA-256 hash of the audio data, which is stored as a file named after it.
+
+    See `blob_path()`. Keeping the audio data out of the database keeps rows small, so
+    lookups only read the index and a few bytes from each row.
+    """
+    size = peewee.IntegerField()
+    """Size of the audio data in bytes."""
+    sample_rate = peewee.IntegerField(default=txsoundgen.audio.SAMPLE_RATE)
+    """Sample rate in Hz of the audio data."""
+    channels = peewee.IntegerField(default=txsoundgen.audio.CHANNELS)
+    """Number of audio channels in the audio data."""
+    sample_width = peewee.IntegerField(default=txsoundgen.audio.SAMPLE_WIDTH)
+    """Size in bytes of each sample in the audio data.
+
+    Audio data is stored as raw PCM, with the WAVE header only added when it is written
+    to file. Entries in a different format to that currently generated are not used.
+    """
+    accessed = peewee.DateTimeField(default=datetime.datetime.now, index=True)
+    """When the cached data was last used, used to evict the least recently used entries."""
 
-    class Meta:  # pylint: disable=R0903
+    class Meta:
         """Used by to manage database metadata."""
 
         table_name = "sound"
         database = db
+        indexes = ((_CACHE_KEY, False),)
+
+
+class MemoryCache:
+    """In-process LRU cache of audio data, in front of `CachedSound`.
+
+    Looking up audio data in the database still means a query and copying the data out
+    of SQLite. Audio data which has already been looked up or generated during this run
+    is kept in memory, up to a limit, so repeated lookups are a dictionary access.
+
+    Thread-safe. `memory_cache` is the instance used by `Sound`.
+    """
+
+    def __init__(self, max_entries: int = 4096, max_size_mb: float = 128):
+        """Initialises a `MemoryCache` object.
+
+        Args:
+            max_entries (int, optional): Maximum number of entries to keep.
+            max_size_mb (float, optional):
+                Maximum total size of audio data to keep, in megabytes.
+        """
+        self.max_entries = max_entries
+        self.max_size = int(max_size_mb * 1024 * 1024)
+        self._entries = collections.OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: tuple):
+        """Returns cached audio data, or `None` if there is none.
+
+        Args:
+            key (tuple): Values identifying the sound, see `Sound._cache_key()`.
+        """
+        with self._lock:
+            data = self._entries.get(key)
+            if data is not None:
+                self._entries.move_to_end(key)
+            return data
+
+    def put(self, key: tuple, data: bytes):
+        """Stores audio data, evicting the least recently used entries if necessary.
+
+        Args:
+            key (tuple): Values identifying the sound, see `Sound._cache_key()`.
+            data (bytes): Audio data to store.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._size -= len(self._entries.pop(key))
+            self._entries[key] = data
+            self._size += len(data)
+            while self._entries and (
+                len(self._entries) > self.max_entries or self._size > self.max_size
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def clear(self):
+        """Removes all entries."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+
+memory_cache = MemoryCache()
+"""Shared `MemoryCache` used by `Sound`."""
+
+_blob_dir = None
+_blob_database = None  # Database path `_blob_dir` was chosen for
+_temp_dir = None  # Temporary directory holding an in-memory cache, if any
+_blob_lock = threading.Lock()
+
+
+@atexit.register
+def _release_blob_dir():
+    """Forgets the blob directory, removing it if it was only for an in-memory cache."""
+    global _blob_dir, _blob_database, _temp_dir
+    if _temp_dir is not None:
+        shutil.rmtree(_temp_dir, ignore_errors=True)
+    _blob_dir = _blob_database = _temp_dir = None
+
+
+def _choose_blob_dir(database: str):
+    """Sets the directory audio data for a database is stored in, see `blob_path()`."""
+    global _blob_dir, _blob_database, _temp_dir
+    if database == ":memory:":
+        _temp_dir = _blob_dir = pathlib.Path(tempfile.mkdtemp(prefix="txsoundgen-"))
+    else:
+        _blob_dir = pathlib.Path(database).parent / "blobs"
+    _blob_database = database
+
+
+def _blob_root():
+    """Returns the directory audio data is stored in, for the database `db` is using."""
+    if _blob_database != db.database:
+        with _blob_lock:
+            if _blob_database != db.database:
+                _release_blob_dir()
+                _choose_blob_dir(db.database)
+    return _blob_dir
+
+
+def blob_path(sha: str):
+    """Returns the path audio data with the given hash is stored at.
+
+    Audio data is stored in a `blobs` directory next to the cache database, split into
+    sub-directories by the first two characters of the hash. For an in-memory database
+    it is stored in a temporary directory instead, which is removed when the database
+    is re-initialised or the interpreter exits.
+
+    Args:
+        sha (str): SHA-256 hash of the audio data, see `CachedSound.sha`.
+
+    Returns:
+        pathlib.Path: Path to the audio data file.
+
+    Raises:
+        peewee.InterfaceError: If no cache database has been initialised.
+    """
+    if db.deferred:
+        raise peewee.InterfaceError("Cache database must be initialised before use.")
+    return _blob_root() / sha[:2] / f"{sha[2:]}.pcm"
+
+
+def _write_blob(data: bytes):
+    """Stores audio data in a file named after its hash, returning the hash."""
+    sha = hashlib.sha256(data).hexdigest()
+    path = blob_path(sha)
+    if not path.exists():
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Written under a temporary name first so readers never see a partial file.
+        temp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+        temp.write_bytes(data)
+        os.replace(temp, path)
+    return sha
+
+
+def _iter_blob(sha: str, chunk_size: int = txsoundgen.audio.CHUNK_SIZE):
+    """Yields the audio data stored for a hash in chunks, as it is read from file."""
+    with blob_path(sha).open("rb") as blob:
+        while True:
+            chunk = blob.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def init_db(path: str = None):
+    """Opens the persistent cache database and creates its tables.
+
+    Audio data is stored in files alongside the database, see `blob_path()`. A cache
+    created by an earlier version, with different columns, is discarded.
+
+    SQLite gives every connection to `:memory:` its own empty database, and peewee
+    opens a connection per thread, so a `:memory:` cache would not be shared with the
+    threads generating sounds. Instead, the cache is kept in a temporary directory,
+    which is removed when the cache is re-initialised or the interpreter exits.
+
+    Args:
+        path (str, optional):
+            Path to the SQLite database file. Defaults to the `TXSOUNDGEN_CACHE`
+            environment variable, or `CACHE_PATH`.
+
+    Returns:
+        peewee.SqliteDatabase: The initialised `db` instance.
+    """
+    global _temp_dir
+    path = path or os.environ.get("TXSOUNDGEN_CACHE", CACHE_PATH)
+    with _blob_lock:
+        _release_blob_dir()
+        if path == ":memory:":
+            _temp_dir = pathlib.Path(tempfile.mkdtemp(prefix="txsoundgen-"))
+            path = str(_temp_dir / "cache.db")
+        pathlib.Path(path).parent.mkdir(parents=True, exist_ok=True)
+        _choose_blob_dir(path)
+    db.init(path, pragmas=CACHE_PRAGMAS)
+    columns = {column.name for column in db.get_columns("sound")}
+    if columns and columns != set(CachedSound._meta.columns):
+        logger.warning("Discarding cache in outdated format '%s'", path)
+        db.drop_tables([CachedSound])
+    db.create_tables([CachedSound])
+    memory_cache.clear()
+    logger.debug("Using cache database '%s'", path)
+    return db
+
+
+def prune_cache(max_size_mb: float):
+    """Evicts the least recently used cache entries over a size limit.
+
+    Args:
+        max_size_mb (float): Maximum total size of cached audio data, in megabytes.
+
+    Returns:
+        int: Number of cache entries removed.
+    """
+    limit = int(max_size_mb * 1024 * 1024)
+    total = CachedSound.select(peewee.fn.SUM(CachedSound.size)).scalar() or 0
+    evict = []
+    query = CachedSound.select(CachedSound.id, CachedSound.sha, CachedSound.size)
+    for entry in query.order_by(CachedSound.accessed):
+        if total <= limit:
+            break
+        evict.append(entry)
+        total -= entry.size
+    if evict:
+        ids = [entry.id for entry in evict]
+        CachedSound.delete().where(CachedSound.id.in_(ids)).execute()
+        for entry in evict:
+            blob_path(entry.sha).unlink(missing_ok=True)
+        memory_cache.clear()
+        logger.info("Evicted %s entries from cache", len(evict))
+    return len(evict)
+
+
+# The cache lookup and insert run once per sound, so they bypass the ORM's query
+# building and model construction and bind parameters to fixed statements instead.
+_GET_SQL = (
+    "SELECT id, sha FROM sound WHERE engine = ? AND language = ? AND voice = ?"
+    " AND service = ? AND trailing_break = ? AND phrase = ? AND sample_rate = ?"
+    " AND channels = ? AND sample_width = ? LIMIT 1"
+)
+_FORMAT = (
+    txsoundgen.audio.SAMPLE_RATE,
+    txsoundgen.audio.CHANNELS,
+    txsoundgen.audio.SAMPLE_WIDTH,
+)
+_TOUCH_SQL = "UPDATE sound SET accessed = ? WHERE id = ?"
+_PUT_SQL = (
+    "INSERT OR IGNORE INTO sound (engine, language, voice, service, trailing_break,"
+    " phrase, sha, size, sample_rate, channels, sample_width, accessed)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
 
 
 class Sound:
@@ -77,14 +369,25 @@ class Sound:
         >>> import boto3
         >>> client = boto3.client('polly')
         >>> from txsoundgen.model import *
-        >>> db.init(':memory:', pragmas = { 'journal_mode': 'wal' })
-        >>> db.create_tables([CachedSound])
+        >>> init_db(':memory:')
+        <peewee.SqliteDatabase object at ...>
         >>> eg = Sound('Welcome to EdgeTX')
         >>> eg.process(client, 'welcome.wav')
         'welcome.wav'
 
     """
 
+    # A voice pack can hold thousands of sounds, so each avoids carrying a `__dict__`.
+    __slots__ = (
+        "config",
+        "phrase",
+        "service",
+        "_cache_key_prefix",
+        "data",
+        "data_ref",
+        "cache_checked",
+    )
+
     def __init__(self, phrase: str, config: dict = None):
         """Initialises a `Sound` object.
 
@@ -98,54 +401,160 @@ class Sound:
         self.config = txsoundgen.utils.merge_config(config)
         self.phrase = phrase
         self.service = "Polly"
+        # Config is read-only, so the cache lookup values only need reading once.
+        self._cache_key_prefix = (
+            self.config["engine"],
+            self.config["language"],
+            self.config["voice"],
+            self.service,
+            self.config["trailing_break"] or "",
+        )
         self.data = None
+        self.cache_checked = False
+        """Whether the database has already been searched for this sound.
+
+        Set by `check_cache()`, or by `txsoundgen.pack.Pack` when it looks up many
+        sounds at once, so sounds known to be missing are not looked up again.
+        """
+        self.data_ref = None
+        """Hash of audio data found in the cache, which is read from file when needed.
+
+        Rather than loading cached audio data for every sound into memory at once, only
+        a reference to it is kept until it is written out. See `audio()`.
+        """
+
+    @property
+    def has_data(self):
+        """Whether audio data has been generated, or found in the cache."""
+        return self.data is not None or self.data_ref is not None
+
+    def audio(self):
+        """Returns the audio data, reading it from the cache if only referenced there.
+
+        Returns:
+            bytes/iterator: Audio data, or an iterator over chunks of it read from file.
+        """
+        if self.data is not None:
+            return self.data
+        return _iter_blob(self.data_ref)
 
     def __repr__(self):
         return self.phrase
 
-    def render(self, client: object = None):
+    def render(self, client: object = None, file: str = None):
         """Generates audio data using `txsoundgen.audio.polly_process()`.
 
+        Requests are limited to `polly_tps` per second across all sounds, see
+        `txsoundgen.utils.RateLimiter`.
+
+        If a file is given, audio data is streamed from Polly using
+        `txsoundgen.audio.polly_stream()` and written to the file as it arrives, rather
+        than only once the whole response has been received. File paths are written
+        under a temporary name and only replaced once complete, so a failed request
+        leaves no file behind.
+
         Args:
             client (botocore.client.Polly):
                 A boto3 client object for communicating with the Amazon Polly service.
+            file (string/file-like object, optional):
+                File path to write audio data to while it is generated.
         """
-        self.data = txsoundgen.audio.polly_process(client, self.phrase)
+        txsoundgen.utils.rate_limiter(self.config["polly_tps"]).acquire()
+        if file is None:
+            self.data = txsoundgen.audio.polly_process(client, self.phrase, self.config)
+            return self.data
+        output = bytearray()
+
+        def tee(stream):
+            for chunk in stream:
+                output.extend(chunk)
+                yield chunk
+
+        stream = tee(txsoundgen.audio.polly_stream(client, self.phrase, self.config))
+        if isinstance(file, (str, os.PathLike)):
+            path = pathlib.Path(file)
+            temp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            try:
+                txsoundgen.audio.wave_write(str(temp), stream)
+                os.replace(temp, path)
+            except BaseException:
+                temp.unlink(missing_ok=True)
+                raise
+        else:
+            txsoundgen.audio.wave_write(file, stream)
+        self.data = bytes(output)
         return self.data
 
+    def _cache_key(self):
+        """Values identifying this sound in the cache, in the order of `_CACHE_KEY`."""
+        return (*self._cache_key_prefix, f"{self.phrase}")
+
     def check_cache(self):
         """Uses cached sound data if it is available.
 
         Checks to see if an identical Speech object exists in the database already, and
-        if so, sets `self.data` with the audio data stored in the cache . This reduces
+        if so, sets `self.data_ref` to the audio data stored in the cache . This reduces
         calls to the cloud speech engine, speeding up processing and reducing costs.
 
-        If no database is initialised this will always return `False`.
+        Audio data already looked up or generated during this run is served from
+        `memory_cache` first. If no database is initialised, only that is available.
 
         Returns:
             bool: Whether or not the sound already exists within the database.
         """
+        if self.has_data:
+            return True
+        key = self._cache_key()
+        self.data = memory_cache.get(key)
+        if self.data is not None:
+            logger.debug('Found existing data for "%s" in memory', self.phrase)
+            return True
+        if self.cache_checked:
+            return False  # Already known to be missing from the database
+        try:
+            cache = db.execute_sql(_GET_SQL, (*key, *_FORMAT)).fetchone()
+            self.cache_checked = True
+            if cache is not None and blob_path(cache[1]).exists():
+                self.data_ref = cache[1]
+                db.execute_sql(_TOUCH_SQL, (str(datetime.datetime.now()), cache[0]))
+        except peewee.InterfaceError:
+            pass
+        if self.data_ref is None:
+            logger.debug('No existing data for "%s" in cache', self.phrase)
+            return False
+        logger.debug('Found existing data for "%s" in cache', self.phrase)
+        return True
+
+    def save_cache(self):
+        """Saves the generated audio data to the cache for future use.
+
+        If no database is initialised this will always return `False`.
+
+        Returns:
+            bool: Whether or not the audio data was saved to the database.
+        """
+        key = self._cache_key()
+        memory_cache.put(key, self.data)
         try:
-            cache = CachedSound.get(
-                engine=self.config["engine"],
-                language=self.config["language"],
-                voice=self.config["voice"],
-                service=self.service,
-                phrase=f"{self.phrase}",
+            sha = _write_blob(self.data)
+            accessed = str(datetime.datetime.now())
+            params = (*key, sha, len(self.data), *_FORMAT, accessed)
+            db.execute_sql(_PUT_SQL, params)
+            logger.info(
+                'Audio data for "%s" saved in cache for future use', self.phrase
             )
-            logger.debug('Found existing data for "%s" in cache', self.phrase)
-            self.data = cache.data
             return True
-        except (peewee.DoesNotExist, peewee.InterfaceError):
-            logger.debug('No existing data for "%s" in cache', self.phrase)
+        except peewee.InterfaceError:
+            logger.warning('Unable to cache audio data for "%s"', self.phrase)
             return False
 
-    def process(self, client: object, file: str):
+    def process(self, client: object, file: str, persister: "Persister" = None):
         """Synthesise phrase and write the data to a WAVE-encoded audio file.
 
-        If appropriate audio data already exists in the database cache, that will be
-        used. Otherwise, audio data is generated by the text-to-speech generation
-        service, and then written to both the cache, and to the specified output file.
+        If the sound has already been generated, or appropriate audio data already
+        exists in the database cache, that will be used. Otherwise, audio data is
+        generated by the text-to-speech generation service, and then written to both the
+        cache, and to the specified output file.
 
         If no cache database is initialised a cache will not be used.
 
@@ -157,33 +566,153 @@ class Sound:
             client (botocore.client.Polly):
                 A boto3 client object for communicating with the Amazon Polly service.
             file (string/file-like object): File path to write audio data to.
+            persister (Persister, optional):
+                If provided, the audio file and cache entry are written by the
+                persister's background thread rather than before returning.
 
         Returns:
             str: File path audio was written to.
         """
-        if isinstance(file, str):
-            file = re.sub(
-                r"(?<!\.wav)$", r".wav", file
-            )  # Ensure file ends in '.wav' extension.
-        if self.check_cache():
+        if isinstance(file, str) and not file.endswith(".wav"):
+            file += ".wav"  # Ensure file ends in '.wav' extension.
+        if self.has_data:
+            logger.info('Using previously generated audio data for "%s"', self.phrase)
+        elif self.check_cache():
             logger.info('Using cached audio data for "%s"', self.phrase)
+        elif persister is None:
+            self.render(client, file)
+            logger.info("Audio data for \"%s\" generated to '%s'", self.phrase, file)
+            self.save_cache()
+            return file
         else:
             self.render(client)
             logger.info('Audio data generated for "%s"', self.phrase)
-            try:
-                CachedSound.create(
-                    engine=self.config["engine"],
-                    language=self.config["language"],
-                    voice=self.config["voice"],
-                    service=self.service,
-                    phrase=self.phrase,
-                    data=self.data,
-                )
-                logger.info(
-                    'Audio data for "%s" saved in cache for future use', self.phrase
-                )
-            except peewee.InterfaceError:
-                logger.warning('Unable to cache audio data for "%s"', self.phrase)
-        txsoundgen.audio.wave_write(file, self.data)
-        logger.info("Audio data for \"%s\" written to '%s'", self.phrase, file)
+            persister.save(self)
+        if persister is None:
+            txsoundgen.audio.wave_write(file, self.audio())
+            logger.info("Audio data for \"%s\" written to '%s'", self.phrase, file)
+        else:
+            persister.write(file, self)
         return file
+
+
+class Persister(threading.Thread):
+    """Writes audio files and cache entries on a background thread.
+
+    When generating many sounds, writing each one to disk and to the cache would
+    otherwise hold up the thread waiting to make the next request to the text-to-speech
+    service. Instead, this work is queued and carried out by a single background
+    thread, overlapping disk and network access.
+
+    Cache entries are buffered and inserted together in a single transaction, rather
+    than each committing (and syncing to disk) separately.
+
+    Can be used as a context manager, which starts the thread and waits for all queued
+    work to complete on exit.
+
+    Example:
+        >>> import boto3
+        >>> client = boto3.client('polly')
+        >>> from txsoundgen.model import Persister, Sound
+        >>> with Persister() as persister:
+        ...     Sound('Welcome to EdgeTX').process(client, 'welcome.wav', persister)
+        'welcome.wav'
+
+    """
+
+    _STOP = object()
+
+    def __init__(self, batch_size: int = 100):
+        """Initialises a `Persister` object.
+
+        Args:
+            batch_size (int, optional):
+                Maximum number of cache entries to buffer before inserting them.
+        """
+        super().__init__(name="txsoundgen-persister", daemon=True)
+        self.queue = queue.Queue()
+        self.error = None
+        self.batch_size = batch_size
+        self._pending = []
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+        if self.error is not None and exc_type is None:
+            raise self.error
+
+    def write(self, file: str, sound: Sound):
+        """Queues the audio data of a sound to be written to a file.
+
+        Args:
+            file (string/file-like object): File path to write audio data to.
+            sound (Sound): Sound to write the audio data of.
+        """
+        self.queue.put((self._write, file, sound))
+
+    def save(self, sound: Sound):
+        """Queues the audio data of a sound to be saved to the cache.
+
+        Args:
+            sound (Sound): Sound to save the audio data of.
+        """
+        self.queue.put((self._save, sound))
+
+    def close(self):
+        """Waits for all queued work to be completed, then stops the thread."""
+        self.queue.put((self._STOP,))
+        self.join()
+
+    def run(self):
+        try:
+            while True:
+                task, *args = self.queue.get()
+                if task is self._STOP:
+                    break
+                self._run(task, *args)
+            self._run(self._flush)
+        finally:
+            if not db.deferred and not db.is_closed():
+                db.close()  # Only closes this thread's connection.
+
+    def _run(self, task, *args):
+        try:
+            task(*args)
+        except Exception as error:
+            logger.error(error)
+            self.error = self.error or error
+
+    @staticmethod
+    def _write(file: str, sound: Sound):
+        txsoundgen.audio.wave_write(file, sound.audio())
+        logger.info("Audio data for \"%s\" written to '%s'", sound.phrase, file)
+
+    def _save(self, sound: Sound):
+        memory_cache.put(sound._cache_key(), sound.data)
+        self._pending.append(sound)
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        if not self._pending:
+            return
+        sounds, self._pending = self._pending, []
+        accessed = str(datetime.datetime.now())
+        try:
+            rows = [
+                dict(
+                    zip(_CACHE_KEY, sound._cache_key()),
+                    sha=_write_blob(sound.data),
+                    size=len(sound.data),
+                    accessed=accessed,
+                )
+                for sound in sounds
+            ]
+            with db.atomic():
+                CachedSound.insert_many(rows).on_conflict_ignore().execute()
+            logger.info("Saved audio data for %s sounds in cache", len(rows))
+        except peewee.InterfaceError:
+            logger.warning("Unable to cache audio data for %s sounds", len(sounds))
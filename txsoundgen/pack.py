@@ -1,17 +1,23 @@
+import datetime
+import functools
+import json
+import logging
 import os
 import pathlib
-
-import logging
 import re
+from concurrent.futures import ThreadPoolExecutor
 
-import boto3
+import peewee
 
-import txsoundgen.utils
+import txsoundgen.audio
 import txsoundgen.model
-
+import txsoundgen.utils
 
 logger = logging.getLogger(__name__)
 
+_UNSAFE_FILENAME = re.compile(r"[^a-z0-9_-]+")
+"""Matches characters which are not allowed in EdgeTX / OpenTX filenames."""
+
 
 class Pack:
     """Voice pack interface, for the creation of multiple sound files as a 'voice pack'."""
@@ -21,8 +27,7 @@ class Pack:
     # TODO: Re-consider how to calculate path
 
     def __init__(self, conf: dict = None):
-        self.config = txsoundgen.utils.merge_config(conf)
-        self.client = boto3.client("polly")
+        self.config = txsoundgen.utils.freeze_config(conf)
         self.name = self.config["name"]
         self.list = self._convert_list(self.config.get("sounds", {}))
 
@@ -30,6 +35,43 @@ class Pack:
         # self.basepath = os.environ.get('VOICEPACK_DIR', '.') + '/'
         # self.path = self.basepath + self.prefix
 
+    def __repr__(self):
+        # Sounds are left out, as packs can hold thousands of them.
+        return f"Pack(name={self.name!r})"
+
+    def to_json(self):
+        """Serialises the voice pack configuration, including its sounds, to JSON.
+
+        The configuration is plain strings and dictionaries, so it can be stored and
+        compared between runs without resorting to `pickle`.
+
+        Returns:
+            str: JSON document containing the merged configuration.
+        """
+        return json.dumps(dict(self.config), separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: str):
+        """Creates a voice pack from configuration serialised by `to_json()`.
+
+        Args:
+            data (str): JSON document containing the voice pack configuration.
+
+        Returns:
+            Pack: The voice pack.
+        """
+        return cls(json.loads(data))
+
+    @functools.cached_property
+    def client(self):
+        """Boto3 client used for communicating with the Amazon Polly service.
+
+        Looked up on first use, so that packs which are entirely cached never pay the
+        cost of loading boto3 and resolving credentials. See
+        `txsoundgen.audio.polly_client()`.
+        """
+        return txsoundgen.audio.polly_client()
+
     def _format_filename(self, name: str):
         """Formats filenames to ensure they are compatible with OpenTX/EdgeTX firmware.
 
@@ -44,8 +86,7 @@ class Pack:
             str: Formatted filename
         """
         safe_length = 6  # Firmware only supports filenames up to six characters.
-        pattern = re.compile(r"[^a-z0-9_-]+")
-        safe_name = pattern.sub("", name.lower())[0:safe_length]
+        safe_name = _UNSAFE_FILENAME.sub("", name.lower())[0:safe_length]
         if safe_name != name:
             logger.warning(
                 "The filename '%s' is not allowed. Changed to '%s'.", name, safe_name
@@ -60,34 +101,226 @@ class Pack:
                 Dictionary of sound groups and sounds. This is expected to be formatted
                 as `{'group': {'name': 'phrase'}}`.
 
+        Identical phrases share a single `Sound` object, so that they are only generated
+        once no matter how many files they are written to.
+
         Returns:
             dict: A converted version of the dictionary containing `Sound` objects.
         """
         output = {}
+        sounds = {}
         for group, content in sound_list.items():
             content_list = {}
             for name, phrase in content.items():
                 key = self._format_filename(name)
-                content_list[key] = txsoundgen.model.Sound(phrase, config=self.config)
+                if phrase not in sounds:
+                    sounds[phrase] = txsoundgen.model.Sound(phrase, config=self.config)
+                content_list[key] = sounds[phrase]
             output[group] = content_list
         return output
 
-    def _generate(self, filename: str, sound: txsoundgen.model.Sound):
+    def _generate(
+        self,
+        filename: str,
+        sound: txsoundgen.model.Sound,
+        persister: txsoundgen.model.Persister = None,
+    ):
         """Wrapper for `txsoundgen.model.sound.process()`.
 
         Args:
             filename (str): Filename to write sound data to.
             sound (txsoundgen.model.Sound): Sound object to process.
+            persister (txsoundgen.model.Persister, optional):
+                Background writer to hand the audio data to.
+        """
+        # Sounds which have already been loaded from the cache never need the client.
+        client = None if sound.has_data else self.client
+        return sound.process(client, filename, persister)
+
+    def _generate_all(
+        self,
+        filenames: list,
+        sound: txsoundgen.model.Sound,
+        persister: txsoundgen.model.Persister = None,
+    ):
+        """Generates a sound once and writes it to each of the given files.
+
+        Args:
+            filenames (list): Filenames to write sound data to.
+            sound (txsoundgen.model.Sound): Sound object to process.
+            persister (txsoundgen.model.Persister, optional):
+                Background writer to hand the audio data to.
+
+        Returns:
+            list: File paths audio was written to.
+        """
+        return [self._generate(filename, sound, persister) for filename in filenames]
+
+    def _warm_cache(self, sounds: list):
+        """Finds cached audio data for many sounds at once.
+
+        Rather than each sound querying the cache individually, cached audio data for
+        every sound is looked up with a handful of queries before any work is scheduled.
+        Only a reference to the data is kept, see `txsoundgen.model.Sound.data_ref`.
+
+        Args:
+            sounds (list): `txsoundgen.model.Sound` objects to load cached data for.
+
+        Returns:
+            int: Number of cache entries found.
         """
-        return sound.process(self.client, filename)
-
-    # def process(self):
-    #     pathlib.Path(self.path).mkdir(parents=True, exist_ok=True)
-    #     worklist = []
-    #     worklist.append('ddd')
-    #     for name, phrase in self.phrases.items():
-    #         worklist.append(Sound(phrase, name, prefix=self.prefix, extension=self.extension))
-    #     logger.debug(f"Processing {len(worklist)} items in soundpack '{self.name}'")
-    #     # for item in worklist:
-    #         # item.generate(self.self.generator)
-    #     queue(self.generator, worklist)
+        model = txsoundgen.model.CachedSound
+        pending = {}
+        for sound in sounds:
+            if not sound.has_data:
+                pending.setdefault(sound.phrase, []).append(sound)
+        phrases = list(pending)
+        found = []
+        try:
+            # Keeps each query well within SQLite's limit on bound parameters.
+            for start in range(0, len(phrases), 500):
+                query = model.select(model.id, model.phrase, model.sha).where(
+                    (model.engine == self.config["engine"])
+                    & (model.language == self.config["language"])
+                    & (model.voice == self.config["voice"])
+                    & (model.service == "Polly")
+                    & (model.trailing_break == (self.config["trailing_break"] or ""))
+                    & (model.phrase.in_(phrases[start : start + 500]))
+                    & (model.sample_rate == txsoundgen.audio.SAMPLE_RATE)
+                    & (model.channels == txsoundgen.audio.CHANNELS)
+                    & (model.sample_width == txsoundgen.audio.SAMPLE_WIDTH)
+                )
+                for cache in query:
+                    if not txsoundgen.model.blob_path(cache.sha).exists():
+                        continue
+                    for sound in pending.get(cache.phrase, []):
+                        sound.data_ref = cache.sha
+                    found.append(cache.id)
+                # Misses are recorded too, so they aren't looked up again one by one.
+                for phrase in phrases[start : start + 500]:
+                    for sound in pending[phrase]:
+                        sound.cache_checked = True
+            if found:
+                model.update(accessed=datetime.datetime.now()).where(
+                    model.id.in_(found)
+                ).execute()
+        except peewee.InterfaceError:
+            logger.debug("No cache available for voice pack '%s'", self.name)
+        logger.debug("Found %s cache entries for '%s'", len(found), self.name)
+        return len(found)
+
+    def _render_batches(
+        self,
+        sounds: list,
+        batch_size: int,
+        persister: txsoundgen.model.Persister,
+    ):
+        """Generates audio data for sounds in batches, rather than one request each.
+
+        Sounds which are already in the cache are skipped, as are phrases containing
+        `<mark>` tags, which would be mistaken for the boundaries between phrases and
+        are left to be generated one request each. Batches are also split to keep each
+        request within Polly's limits, see `txsoundgen.audio.polly_split_batches()`.
+        Newly generated audio data is handed to the persister to be saved to the cache.
+
+        Args:
+            sounds (list): `txsoundgen.model.Sound` objects to generate.
+            batch_size (int): Maximum number of sounds to generate per request.
+            persister (txsoundgen.model.Persister):
+                Background writer to hand the audio data to.
+        """
+        pending = [
+            sound
+            for sound in sounds
+            if "<mark" not in str(sound.phrase) and not sound.check_cache()
+        ]
+        phrases = [sound.phrase for sound in pending]
+        batches = txsoundgen.audio.polly_split_batches(phrases, batch_size, self.config)
+        for indexes in batches:
+            batch = [pending[index] for index in indexes]
+            # Each batch makes two requests, one for speech marks and one for audio.
+            limiter = txsoundgen.utils.rate_limiter(self.config["polly_tps"])
+            limiter.acquire()
+            limiter.acquire()
+            data = txsoundgen.audio.polly_process_batch(
+                self.client, [sound.phrase for sound in batch], self.config
+            )
+            for sound, audio in zip(batch, data):
+                sound.data = audio
+                persister.save(sound)
+
+    def _setup(self, path: str = None):
+        """Prepares the cache and output directories before generating the voice pack.
+
+        Args:
+            path (str, optional): Directory to write the voice pack to.
+                See `process()`.
+
+        Returns:
+            list: `(filename, sound)` pairs for every sound in the voice pack.
+        """
+        if txsoundgen.model.db.deferred:
+            txsoundgen.model.init_db(self.config.get("cache"))
+        path = pathlib.Path(path or self.config.get("path", f"voicepacks/{self.name}"))
+        worklist = []
+        for group, content in self.list.items():
+            group_path = path / group
+            group_path.mkdir(parents=True, exist_ok=True)
+            # Built once per group, leaving a single string format per sound.
+            prefix = f"{group_path}{os.sep}"
+            for name, sound in content.items():
+                worklist.append((f"{prefix}{name}.wav", sound))
+        return worklist
+
+    def process(self, path: str = None, workers: int = None, batch_size: int = 0):
+        """Generates every sound in the voice pack, writing them to disk.
+
+        Sounds are generated concurrently, as each one is dominated by a round-trip to
+        the text-to-speech service rather than local processing. Each sound is written
+        to `<path>/<group>/<name>.wav`.
+
+        Previously generated sounds are re-used from the persistent cache (see
+        `txsoundgen.model.init_db()`), which is opened from the `cache` key of the pack
+        configuration if no cache has been initialised yet. Once the pack has been
+        generated, the least recently used entries are evicted to keep the cache within
+        `cache_size_mb` megabytes (10 by default), unless it is set to `None`.
+
+        Args:
+            path (str, optional):
+                Directory to write the voice pack to. Defaults to the `path` key of the
+                pack configuration, or `voicepacks/<name>`.
+            workers (int, optional): Maximum number of sounds to generate at once.
+                Defaults to the `max_workers` key of the pack configuration, or 3.
+            batch_size (int, optional):
+                If set, sounds are synthesised this many at a time in a single request
+                using `txsoundgen.audio.polly_process_batch()`, rather than one request
+                per sound. Useful for packs made up of many short phrases.
+
+        Returns:
+            list: File paths written to, in the same order as the sound list.
+        """
+        worklist = self._setup(path)
+        logger.debug("Processing %s items in voice pack '%s'", len(worklist), self.name)
+        # Sounds shared by several files are generated once, by a single worker, rather
+        # than several workers racing to generate the same phrase.
+        shared = {}
+        for filename, sound in worklist:
+            shared.setdefault(id(sound), (sound, []))[1].append(filename)
+        sounds = [sound for sound, _ in shared.values()]
+        self._warm_cache(sounds)
+        workers = workers or self.config.get("max_workers", 3)
+        # boto3 clients are thread-safe, and peewee opens a connection per thread.
+        # Workers only make requests, leaving disk and cache writes to the persister.
+        persister = txsoundgen.model.Persister()
+        with persister, ThreadPoolExecutor(max_workers=workers) as executor:
+            if batch_size:
+                self._render_batches(sounds, batch_size, persister)
+            results = executor.map(
+                lambda item: self._generate_all(item[1], item[0], persister),
+                shared.values(),
+            )
+            written = dict(zip(shared, results))
+        files = [written[id(sound)].pop(0) for _, sound in worklist]
+        if self.config.get("cache_size_mb"):
+            txsoundgen.model.prune_cache(self.config["cache_size_mb"])
+        return files
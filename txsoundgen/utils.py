@@ -2,8 +2,14 @@
 
 Contents:
     - `merge_config()` - Merges provided configuration dictionary with default configuration.
+    - `freeze_config()` - Merges configuration with the default configuration once, for re-use.
+    - `RateLimiter` - Thread-safe token bucket used to limit the rate of requests.
+    - `rate_limiter()` - Returns the shared `RateLimiter` for a given rate.
 """
-
+import functools
+import threading
+import time
+import types
 
 default_config = {
     "language": "en-GB",
@@ -11,11 +17,23 @@ default_config = {
     "engine": "standard",
     "extension": "wav",
     "name": "default",
+    "polly_tps": 8,
+    "trailing_break": "weak",
+    "cache_size_mb": 10,
 }
 """Default configuration used for numerous objects, mainly used to provide configuration
 to Amazon Polly.
 """
 
+_frozen_default_config = types.MappingProxyType(default_config)
+"""Read-only view of `default_config`, returned when there is nothing to merge."""
+
+
+@functools.lru_cache(maxsize=64)
+def _merge_frozen(items: tuple):
+    """Merges sorted configuration items with the default configuration, read-only."""
+    return types.MappingProxyType({**default_config, **dict(items)})
+
 
 def merge_config(config: dict = None):
     """Merges provided configuration dictionary with default configuration.
@@ -27,7 +45,12 @@ def merge_config(config: dict = None):
         config (dict): Dictionary containing configuration for txsoundgen.
 
     Returns:
-        (dict): A dictionary containing the configuration, merged with the default values.
+        (types.MappingProxyType): A read-only view of the configuration, merged with
+            the default values, so callers that need to modify it should copy it first.
+            Where every value can be hashed, the view is shared by all calls with an
+            equal configuration. Read-only configurations which already contain every
+            default key (such as those returned by `freeze_config()`) are returned as
+            they are.
 
     Later down the line, this may provide validation of configuration parameters.
 
@@ -36,16 +59,105 @@ def merge_config(config: dict = None):
         >>> import txsoundgen.utils
         >>> my_dict = {"language": "en-US"}
         >>> txsoundgen.utils.merge_config(my_dict)
-        {
+        mappingproxy({
             'language': 'en-US',
             'voice': 'Amy',
             'engine': 'standard',
             'extension': 'wav',
-            'name': 'default'
-        }
+            'name': 'default',
+            'polly_tps': 8,
+            'trailing_break': 'weak',
+            'cache_size_mb': 10
+        })
 
         ```
     """
     if not config:
-        config = {}
-    return {**default_config, **config}  # Combine default config with provided conf
+        return _frozen_default_config
+    if (
+        isinstance(config, types.MappingProxyType)
+        and config.keys() >= default_config.keys()
+    ):
+        return config  # Already merged, and cannot have been modified since
+    try:
+        # Sorted so that equal configurations share a single cached entry.
+        return _merge_frozen(tuple(sorted(config.items())))
+    except TypeError:  # Unhashable values, such as a nested list of sounds
+        return types.MappingProxyType({**default_config, **config})
+
+
+def freeze_config(config: dict = None):
+    """Merges configuration with the default configuration once, for re-use.
+
+    Objects such as `txsoundgen.pack.Pack` pass the same configuration on to every sound
+    they create. Freezing it means each of those can skip merging it again.
+
+    Args:
+        config (dict): Dictionary containing configuration for txsoundgen.
+
+    Returns:
+        (types.MappingProxyType): A read-only view of the merged configuration.
+    """
+    return merge_config(config)
+
+
+class RateLimiter:
+    """Thread-safe token bucket used to limit the rate of requests.
+
+    Text-to-speech services such as Amazon Polly limit the number of requests per second
+    for an account. When sounds are generated concurrently, bursts of requests would
+    otherwise be rejected and retried with increasingly long back-off delays. Instead,
+    each request takes a token from the bucket, waiting for one to become available if
+    necessary, so throughput stays steady at the limit.
+
+    Example:
+        ```python
+        >>> from txsoundgen.utils import RateLimiter
+        >>> limiter = RateLimiter(8)
+        >>> limiter.acquire()
+
+        ```
+    """
+
+    def __init__(self, rate: float, burst: int = None):
+        """Initialises a `RateLimiter` object.
+
+        Args:
+            rate (float): Number of requests allowed per second.
+            burst (int, optional):
+                Number of requests allowed at once before waiting. Defaults to `rate`.
+        """
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Takes a token from the bucket, waiting until one is available."""
+        with self._lock:
+            while True:
+                now = time.monotonic()
+                elapsed = now - self._updated
+                self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                time.sleep((1 - self._tokens) / self.rate)
+
+
+@functools.lru_cache(maxsize=None)
+def rate_limiter(rate: float):
+    """Returns the shared `RateLimiter` for a given rate.
+
+    Rate limits apply to the whole account rather than to individual objects, so every
+    caller using the same rate shares a single bucket.
+
+    Args:
+        rate (float): Number of requests allowed per second.
+
+    Returns:
+        RateLimiter: The shared rate limiter.
+    """
+    return RateLimiter(rate)